@@ -1,6 +1,27 @@
+import io
 import pytest
-from datetime import date
-from weather import DailyWeather, HistoricalWeather, Country, load_data
+from datetime import date, timedelta
+from weather import DailyWeather, HistoricalWeather, Country, load_data, \
+    load_country
+
+# A fixed date used in place of date.today(), so that test outcomes do not
+# depend on when the suite is run. HistoricalWeather.__str__ does not pad the
+# day with a leading zero, so pick a day with two digits.
+_FIXED_DATE = date(2023, 1, 15)
+_FIXED_DATE_STR = _FIXED_DATE.strftime("%Y-%m-%d")
+
+# Shared statistics for days where only the other half of the data matters.
+_ZERO_TEMPS = (0, 0, 0)
+_ZERO_PRECIP = (0, 0, 0)
+
+# The contents of the sample csv files, read once when this module is
+# imported so that tests can parse them from memory.
+with open('weather_data/small_sample_data.csv') as _f:
+    _SMALL_CSV = _f.read()
+with open('weather_data/empty_sample_data.csv') as _f:
+    _EMPTY_CSV = _f.read()
+with open('weather_data/test_sample_data.csv') as _f:
+    _TEST_CSV = _f.read()
 
 
 ################################################################################
@@ -21,6 +42,25 @@ from weather import DailyWeather, HistoricalWeather, Country, load_data
 # WARNING: THIS IS CURRENTLY AN EXTREMELY INCOMPLETE SET OF TESTS!
 # We will test your code on a much more thorough set of tests!
 ################################################################################
+@pytest.fixture(scope="session")
+def small_sample():
+    """The HistoricalWeather loaded from small_sample_data.csv, parsed once
+    per test session."""
+    return load_data(io.StringIO(_SMALL_CSV))
+
+
+@pytest.fixture(scope="session")
+def empty_sample():
+    """The result of load_data on empty_sample_data.csv."""
+    return load_data(io.StringIO(_EMPTY_CSV))
+
+
+@pytest.fixture(scope="session")
+def test_sample():
+    """The HistoricalWeather loaded from test_sample_data.csv."""
+    return load_data(io.StringIO(_TEST_CSV))
+
+
 def test_add_and_retrieve_weather():
     """Test that we can add and retrieve a single weather record from
     HistoricalWeather."""
@@ -34,18 +74,37 @@ def test_add_and_retrieve_weather():
         "DailyWeather object that was added to that date."
 
 
-def test_record_high():
-    """Test record_high on a HistoricalWeather with two points of data, where the
+@pytest.fixture(scope="module")
+def record_high_hw():
+    """A HistoricalWeather with two points of data on June 4, where the
     record high is at the earlier year."""
     historical = HistoricalWeather("City Name", (-1.234, 4.567))
+    for d, temps in [(date(2012, 6, 4), (0, 0, 20)),
+                     (date(2010, 6, 4), (0, 0, 30))]:
+        historical.add_weather(d, DailyWeather(temps, _ZERO_PRECIP))
+    return historical
+
 
-    historical.add_weather(date(2012, 6, 4),
-                           DailyWeather((0, 0, 20), (0, 0, 0)))
+def test_record_high(record_high_hw):
+    """Test record_high on a HistoricalWeather with two points of data, where the
+    record high is at the earlier year."""
+    assert record_high_hw.record_high(6, 4) == 30
 
-    historical.add_weather(date(2010, 6, 4),
-                           DailyWeather((0, 0, 30), (0, 0, 0)))
 
-    assert historical.record_high(6, 4) == 30
+# One day of temperatures (average, low, high) per month of 2012.
+_MONTHLY = [(date(2012, m, d), (avg, low, high))
+            for m, d, avg, low, high in [(1, 8, -0.25, -1.75, 0.25),
+                                         (2, 9, 0.0, -3.0, 1.0),
+                                         (3, 10, 0.75, -3.75, 2.25),
+                                         (4, 11, 2.0, -4.0, 4.0),
+                                         (5, 12, 3.75, -3.75, 6.25),
+                                         (6, 13, 6.0, -3.0, 9.0),
+                                         (7, 14, 8.75, -1.75, 12.25),
+                                         (8, 15, 12.0, 0.0, 16.0),
+                                         (9, 16, 15.75, 2.25, 20.25),
+                                         (10, 17, 20.0, 5.0, 25.0),
+                                         (11, 18, 24.75, 8.25, 30.25),
+                                         (12, 19, 30.0, 12.0, 36.0)]]
 
 
 def test_monthly_average():
@@ -53,41 +112,8 @@ def test_monthly_average():
     per month, all within a single year."""
     historical = HistoricalWeather("City Name", (-1.234, 4.567))
 
-    historical.add_weather(date(2012, 1, 8),
-                           DailyWeather((-0.25, -1.75, 0.25), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 2, 9),
-                           DailyWeather((0.0, -3.0, 1.0), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 3, 10),
-                           DailyWeather((0.75, -3.75, 2.25), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 4, 11),
-                           DailyWeather((2.0, -4.0, 4.0), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 5, 12),
-                           DailyWeather((3.75, -3.75, 6.25), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 6, 13),
-                           DailyWeather((6.0, -3.0, 9.0), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 7, 14),
-                           DailyWeather((8.75, -1.75, 12.25), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 8, 15),
-                           DailyWeather((12.0, 0.0, 16.0), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 9, 16),
-                           DailyWeather((15.75, 2.25, 20.25), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 10, 17),
-                           DailyWeather((20.0, 5.0, 25.0), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 11, 18),
-                           DailyWeather((24.75, 8.25, 30.25), (0, 0, 0)))
-
-    historical.add_weather(date(2012, 12, 19),
-                           DailyWeather((30.0, 12.0, 36.0), (0, 0, 0)))
+    for d, temps in _MONTHLY:
+        historical.add_weather(d, DailyWeather(temps, _ZERO_PRECIP))
 
     assert historical.monthly_average() == {'Jan': -1.75, 'Feb': -3.0,
                                             'Mar': -3.75, 'Apr': -4.0,
@@ -98,38 +124,40 @@ def test_monthly_average():
                                             }
 
 
-def test_contiguous_precipitation():
-    """Test contiguous_precipitation on a HistoricalWeather that has alternating
-    snow and rain."""
+@pytest.fixture(scope="module")
+def alternating_precip_hw():
+    """A HistoricalWeather with five consecutive days of alternating snow
+    and rain."""
     historical = HistoricalWeather("City Name", (-1.234, 4.567))
+    for d, precip in [(date(2012, 6, 4), (3, 3, 0)),
+                      (date(2012, 6, 5), (2, 0, 2)),
+                      (date(2012, 6, 6), (4, 4, 0)),
+                      (date(2012, 6, 7), (1, 0, 1)),
+                      (date(2012, 6, 8), (5, 5, 0))]:
+        historical.add_weather(d, DailyWeather(_ZERO_TEMPS, precip))
+    return historical
 
-    historical.add_weather(date(2012, 6, 4),
-                           DailyWeather((0, 0, 0), (3, 3, 0)))
-
-    historical.add_weather(date(2012, 6, 5),
-                           DailyWeather((0, 0, 0), (2, 0, 2)))
 
-    historical.add_weather(date(2012, 6, 6),
-                           DailyWeather((0, 0, 0), (4, 4, 0)))
-
-    historical.add_weather(date(2012, 6, 7),
-                           DailyWeather((0, 0, 0), (1, 0, 1)))
+def test_contiguous_precipitation(alternating_precip_hw):
+    """Test contiguous_precipitation on a HistoricalWeather that has alternating
+    snow and rain."""
+    assert alternating_precip_hw.contiguous_precipitation() == \
+        (date(2012, 6, 4), 5)
 
-    historical.add_weather(date(2012, 6, 8),
-                           DailyWeather((0, 0, 0), (5, 5, 0)))
 
-    assert historical.contiguous_precipitation() == (date(2012, 6, 4), 5)
+@pytest.fixture(scope="module")
+def snow_and_rain_hw():
+    """A HistoricalWeather with a single day with both snow and rain."""
+    historical = HistoricalWeather("City Name", (-1.234, 4.567))
+    historical.add_weather(date(2012, 11, 21),
+                           DailyWeather(_ZERO_TEMPS, (7, 3, 2)))
+    return historical
 
 
-def test_percentage_snowfall():
+def test_percentage_snowfall(snow_and_rain_hw):
     """Test percentage_snowfall on a HistoricalWeather that has a single day
     with both snow and rain"""
-    historical = HistoricalWeather("City Name", (-1.234, 4.567))
-
-    historical.add_weather(date(2012, 11, 21),
-                           DailyWeather((0, 0, 0), (7, 3, 2)))
-
-    assert historical.percentage_snowfall() == 0.4
+    assert snow_and_rain_hw.percentage_snowfall() == 0.4
 
 
 def test_add_and_retrieve_history():
@@ -156,10 +184,10 @@ def test_snowiest_location():
                            DailyWeather((-5, -10, 15), (7, 3, 2)))
 
     historical.add_weather(date(2012, 10, 21),
-                           DailyWeather((-7, -20, 15), (0, 0, 0)))
+                           DailyWeather((-7, -20, 15), _ZERO_PRECIP))
 
     historical.add_weather(date(2011, 11, 21),
-                           DailyWeather((-8, -15, 15), (0, 0, 0)))
+                           DailyWeather((-8, -15, 15), _ZERO_PRECIP))
 
     country.add_history(historical)
 
@@ -177,10 +205,23 @@ def test_snowiest_location():
     assert country.snowiest_location() == ('City Name', 0.4)
 
 
-def test_load_data():
+def test_generate_summary(small_sample, tmp_path):
+    """Test that generate_summary writes a header and one row per location
+    to the given path."""
+    country = Country('Canada')
+    country.add_history(small_sample)
+    report = tmp_path / 'report.md'
+    country.generate_summary(str(report))
+
+    lines = report.read_text().splitlines()
+    assert len(lines) == 3
+    assert lines[0].startswith('Location | record high')
+    assert lines[2].startswith('THUNDER BAY')
+
+
+def test_load_data(small_sample):
     """Test load_data on small_sample_data.csv"""
-    with open('weather_data/small_sample_data.csv') as source:
-        historical_weather = load_data(source)
+    historical_weather = small_sample
 
     assert historical_weather is not None, \
         "HistoricalWeather should have been returned when calling load_data " \
@@ -189,14 +230,34 @@ def test_load_data():
     assert historical_weather.name == 'THUNDER BAY'
 
 
-def test_load_data_empty():
+def test_load_data_empty(empty_sample):
     """Test that load_data returns None on an empty csv file"""
-    with open('weather_data/empty_sample_data.csv') as source:
-        historical_weather = load_data(source)
+    historical_weather = empty_sample
 
     assert historical_weather is None
 
 
+def test_load_country():
+    """Test that load_country adds the locations from the files in
+    weather_data, skipping files with no well-formed rows of data."""
+    country = load_country('weather_data', 'Canada')
+    assert country.name == 'Canada'
+    assert country.retrieve_history('THUNDER BAY') is not None
+    assert country.retrieve_history('YORK') is None
+
+
+def test_load_country_quoted_line_break(tmp_path):
+    """Test that load_country keeps a quoted station name containing a
+    Windows line break in a single field."""
+    header = _SMALL_CSV.split('\n', 1)[0]
+    line = '89.2477,48.3809,"THUNDER\r\nBAY",1107384,12/24/2020,2020,12,24,' \
+           ',1.2,,-10.3,,0.8,,15.1,,9.7,,0,,0,,0,,,,,,,'
+    (tmp_path / 'station.csv').write_bytes(
+        f'{header}\r\n{line}\r\n'.encode('utf-8'))
+    country = load_country(str(tmp_path), 'Canada')
+    assert country.retrieve_history('THUNDER\r\nBAY') is not None
+
+
 """Tests for class DailyWeather"""
 
 
@@ -220,9 +281,9 @@ def test_historical_weather_init_and_str():
     dw3 = DailyWeather((6, -11, 17), (10, 3, 2))
     hw1 = HistoricalWeather('New York', (1, 2))
     hw2 = HistoricalWeather('Toronto', (3,1))
-    hw1.add_weather(date.today(), dw1)
+    hw1.add_weather(_FIXED_DATE, dw1)
     hw1.add_weather(date(2018,12,1), dw2)
-    hw2.add_weather(date.today(), dw3)
+    hw2.add_weather(_FIXED_DATE, dw3)
 """
 
 #def test_add_weather():
@@ -232,10 +293,10 @@ def test_add_weather_date_exists():
     dw2 = DailyWeather((5, -10, 15), (-1, -1, 5))
     dw3 = DailyWeather((6, -11, 17), (10, 3, 2))
     hw1 = HistoricalWeather('New York', (1, 2))
-    hw1.add_weather(date.today(), dw1)
-    hw1.add_weather(date.today(), dw2)
-    hw1.add_weather(date.today(), dw3)
-    assert hw1.__str__() == f'New York (1, 2):\n{date.today().strftime("%Y-%m-%d")}: Average: 10 Low: 5 High: 20 Precipitation: 16 Snow: 12 Rain: -1'
+    hw1.add_weather(_FIXED_DATE, dw1)
+    hw1.add_weather(_FIXED_DATE, dw2)
+    hw1.add_weather(_FIXED_DATE, dw3)
+    assert hw1.__str__() == f'New York (1, 2):\n{_FIXED_DATE_STR}: Average: 10 Low: 5 High: 20 Precipitation: 16 Snow: 12 Rain: -1'
 
 #def test_retrieve_weather():
 
@@ -243,7 +304,7 @@ def test_add_weather_date_exists():
 def test_retrieve_weather_no_date():
     dw1 = DailyWeather((10, 5, 20), (16, -1, 12))
     hw1 = HistoricalWeather('New York', (1, 2))
-    hw1.add_weather(date.today(), dw1)
+    hw1.add_weather(_FIXED_DATE, dw1)
     assert hw1.retrieve_weather(date(2020, 6, 1)) is None
 
 
@@ -251,7 +312,7 @@ def test_record_high_if_tie():
     dw1 = DailyWeather((10, 5, 20), (16, -1, 12))
     dw2 = DailyWeather((10, 5, 20), (16, -1, 12))
     hw1 = HistoricalWeather('New York', (1, 2))
-    hw1.add_weather(date.today(), dw1)
+    hw1.add_weather(_FIXED_DATE, dw1)
     hw1.add_weather(date(1999, 2, 5), dw2)
     assert hw1.record_high(2, 5)
 
@@ -261,7 +322,34 @@ def test_record_high_if_tie():
 
 #def test_contiguous_precipitation_when_tie():
 
-#def test_contiguous_precipitation_when_zero():
+def test_contiguous_precipitation_when_zero():
+    hw1 = HistoricalWeather('New York', (1, 2))
+    hw1.add_weather(date(2012, 6, 4), DailyWeather(_ZERO_TEMPS, _ZERO_PRECIP))
+    hw1.add_weather(date(2012, 6, 5), DailyWeather(_ZERO_TEMPS, _ZERO_PRECIP))
+    assert hw1.contiguous_precipitation() == (date(2012, 6, 4), 0)
+
+
+def test_contiguous_precipitation_with_gap():
+    hw1 = HistoricalWeather('New York', (1, 2))
+    hw1.add_weather(date(2012, 6, 4), DailyWeather(_ZERO_TEMPS, (1, 1, 0)))
+    hw1.add_weather(date(2012, 6, 5), DailyWeather(_ZERO_TEMPS, (-1, 0, 0)))
+    hw1.add_weather(date(2012, 6, 7), DailyWeather(_ZERO_TEMPS, (2, 2, 0)))
+    hw1.add_weather(date(2012, 6, 8), DailyWeather(_ZERO_TEMPS, (1, 0, 1)))
+    hw1.add_weather(date(2012, 6, 9), DailyWeather(_ZERO_TEMPS, (3, 3, 0)))
+    assert hw1.contiguous_precipitation() == (date(2012, 6, 7), 3)
+
+
+def test_contiguous_precipitation_large_span():
+    """Test contiguous_precipitation on a century of alternating wet and dry
+    days added newest first, with one longer run in the middle."""
+    hw1 = HistoricalWeather('New York', (1, 2))
+    start = date(1920, 1, 1)
+    run_start = start + timedelta(days=20000)
+    for offset in range(36500, -1, -1):
+        d = start + timedelta(days=offset)
+        wet = offset % 2 == 0 or run_start <= d < run_start + timedelta(6)
+        hw1.add_weather(d, DailyWeather(_ZERO_TEMPS, (1 if wet else 0, 1, 0)))
+    assert hw1.contiguous_precipitation() == (run_start, 7)
 
 #def test_percentage_snowfall_no_snowfall():
 
@@ -284,21 +372,49 @@ def test_record_high_if_tie():
 #def test_snowiest_location_when_empty():
 
 
-def test_load_data_random_lines_match_expected():
-    with open('weather_data/small_sample_data.csv') as source:
-        historical_weather = load_data(source)
-        assert historical_weather.retrieve_weather(date(2017, 3, 11)).precipitation == -1
-
-def test_load_data_omits_ill_formed_lines():
-    with open('weather_data/test_sample_data.csv') as source:
-        historical_weather = load_data(source)
-        assert historical_weather.retrieve_weather(date(2020,5,17)) is None
-        assert historical_weather.retrieve_weather(date(2020,12,24)) is not None
+@pytest.mark.parametrize("d, attr, expected", [
+    # Trace amounts of precipitation
+    (date(2017, 3, 11), 'precipitation', -1),
+    # Trace amounts of snowfall
+    (date(2020, 12, 30), 'snowfall', -1),
+])
+def test_load_data_values(small_sample, d, attr, expected):
+    """Test that load_data records the expected values from
+    small_sample_data.csv, including converting trace amounts to -1."""
+    record = small_sample.retrieve_weather(d)
+    assert record is not None
+    assert getattr(record, attr) == expected
+
+
+def test_load_data_quoted_station_name():
+    """Test that load_data keeps a quoted station name containing a comma
+    in a single column."""
+    header = _SMALL_CSV.split('\n', 1)[0]
+    line = '89.2477,48.3809,"THUNDER BAY, ON",1107384,12/24/2020,2020,12,24,' \
+           ',1.2,,-10.3,,0.8,,15.1,,9.7,,0,,0,,0,,,,,,,'
+    historical_weather = load_data(io.StringIO(f'{header}\n{line}\n'))
+    assert historical_weather.name == 'THUNDER BAY, ON'
+    assert historical_weather.retrieve_weather(date(2020, 12, 24)) is not None
+
+
+def test_summary_statistics_matches_individual_methods(small_sample):
+    """Test that summary_statistics agrees with the methods it combines."""
+    assert small_sample.summary_statistics() == (
+        small_sample.record_high(12, 25),
+        small_sample.monthly_average()['Dec'],
+        small_sample.contiguous_precipitation()[1],
+        small_sample.percentage_snowfall())
+
+
+@pytest.mark.parametrize("d, present", [
+    (date(2020, 5, 17), False),
+    (date(2020, 12, 24), True),
+])
+def test_load_data_omits_ill_formed_lines(test_sample, d, present):
+    """Test that load_data skips rows of test_sample_data.csv with missing
+    or malformed data, but keeps the well-formed ones."""
+    assert (test_sample.retrieve_weather(d) is not None) == present
 
-def test_load_data_converts_trace_amounts():
-    with open('weather_data/small_sample_data.csv') as source:
-        historical_weather = load_data(source)
-        assert historical_weather.retrieve_weather(date(2020, 12, 30)).snowfall == -1
 
 if __name__ == '__main__':
     pytest.main(['tests.py'])
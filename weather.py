@@ -1,5 +1,7 @@
+from concurrent.futures import ProcessPoolExecutor
 from datetime import date, timedelta
-from typing import Tuple, Dict, Optional, TextIO, Union
+from typing import Tuple, Dict, List, Optional, Set, TextIO, Union
+import csv
 import os
 
 # The column numbers where each kind of information appears.  For example,
@@ -20,6 +22,14 @@ SNOW_ON_GRND, SNOW_ON_GRND_FLAG = 25, 26
 DIR_MAX_GUST, DIR_MAX_GUST_FLAG = 27, 28
 SPD_MAX_GUST, SPD_MAX_GUST_FLAG = 29, 30
 
+# The value recorded for precipitation, rainfall or snowfall when there were
+# only trace amounts.
+TRACE = -1
+
+# The three-character names of the months, in order from January.
+MONTH_NAMES = ('Jan', 'Feb', 'Mar', 'Apr', 'May', 'Jun',
+               'Jul', 'Aug', 'Sep', 'Oct', 'Nov', 'Dec')
+
 
 class DailyWeather:
     """Weather facts for a single day.
@@ -52,6 +62,8 @@ class DailyWeather:
     >>> print(weather.precipitation)
     5
     """
+    __slots__ = ('avg_temp', 'low_temp', 'high_temp', 'precipitation',
+                 'snowfall', 'rainfall')
     avg_temp: float
     low_temp: float
     high_temp: float
@@ -115,10 +127,22 @@ class HistoricalWeather:
         date and its value is the location's weather on that day. There may
         be gaps in the data. For example, there could be data for Jan 1, 2020
         and Jan 5, 2020, but not for the days in between.
+    _record_highs: Each key is a (month, day) and its value is the highest
+        temperature in _records on that month and day in any year.
+    _low_temp_totals: _low_temp_totals[m] is the sum of the low temperatures
+        in _records for month m of any year. Index 0 is unused.
+    _low_temp_counts: _low_temp_counts[m] is the number of records in
+        _records for month m of any year. Index 0 is unused.
+    _total_snowfall: The total snowfall in _records, ignoring trace amounts.
+    _total_rainfall: The total rainfall in _records, ignoring trace amounts.
+    _precipitation_days: The ordinals (see date.toordinal) of the dates in
+        _records whose weather had precipitation, including trace amounts.
 
     === Representation Invariants ===
     - coordinates[0] is a valid latitude (between -90 and 90)
     - coordinates[1] is a valid longitude (between -180 and 180)
+    - _record_highs, _low_temp_totals, _low_temp_counts, _total_snowfall,
+      _total_rainfall and _precipitation_days are kept in step with _records
 
     === Sample Usage ===
     >>> weather = DailyWeather((13, 9, 20), (5, 0, 0))
@@ -131,9 +155,18 @@ class HistoricalWeather:
     >>> print(toronto_weather.retrieve_weather(date.today()).avg_temp)
     13
     """
+    __slots__ = ('name', 'coordinates', '_records', '_record_highs',
+                 '_low_temp_totals', '_low_temp_counts', '_total_snowfall',
+                 '_total_rainfall', '_precipitation_days')
     name: str
     coordinates: Tuple[float, float]
     _records: Dict[date, DailyWeather]
+    _record_highs: Dict[Tuple[int, int], float]
+    _low_temp_totals: List[float]
+    _low_temp_counts: List[int]
+    _total_snowfall: float
+    _total_rainfall: float
+    _precipitation_days: Set[int]
 
     def __init__(self, name: str, coordinates: Tuple[float, float]) -> None:
         """Initialize this historical weather record with these coordinates,
@@ -148,6 +181,12 @@ class HistoricalWeather:
         self.name = name
         self.coordinates = coordinates
         self._records = {}
+        self._record_highs = {}
+        self._low_temp_totals = [0] * 13
+        self._low_temp_counts = [0] * 13
+        self._total_snowfall = 0
+        self._total_rainfall = 0
+        self._precipitation_days = set()
 
     # We will not test this method, but we recommend that you write and use it.
     def __str__(self) -> str:
@@ -180,11 +219,20 @@ Rain: 0
         >>> print(toronto_weather.retrieve_weather(date.today()).avg_temp)
         13
         """
-        for key in self._records:
-            if key == d:
-                return None
-        self._records[d] = w
-        return None
+        if d not in self._records:
+            self._records[d] = w
+            month_day = (d.month, d.day)
+            if month_day not in self._record_highs or \
+                    w.high_temp > self._record_highs[month_day]:
+                self._record_highs[month_day] = w.high_temp
+            self._low_temp_totals[d.month] += w.low_temp
+            self._low_temp_counts[d.month] += 1
+            if w.snowfall != TRACE:
+                self._total_snowfall += w.snowfall
+            if w.rainfall != TRACE:
+                self._total_rainfall += w.rainfall
+            if w.precipitation > 0 or w.precipitation == TRACE:
+                self._precipitation_days.add(d.toordinal())
 
     def retrieve_weather(self, d: date) -> Optional[DailyWeather]:
         """Return the weather on day d if available, otherwise return None.
@@ -195,11 +243,7 @@ Rain: 0
         >>> toronto_weather.retrieve_weather(date.today()).avg_temp == 13
         True
         """
-        for key in self._records:
-            if d == key:
-                return self._records[d]
-        else:
-            return None
+        return self._records.get(d)
 
     def record_high(self, m: int, d: int) -> int:
         """Return the highest temperature recorded at this location on month m
@@ -223,11 +267,7 @@ Rain: 0
         >>> toronto_weather.record_high(6, 8)
         40
         """
-        temp_list = []
-        for key in self._records:
-            if key.month == m and key.day == d:
-                temp_list.append(self._records[key].high_temp)
-        return max(temp_list)
+        return self._record_highs[(m, d)]
 
     def monthly_average(self) -> Dict[str, float]:
         """For each of the 12 months, return the average of the minimum
@@ -258,17 +298,12 @@ Rain: 0
         True
         """
         dictionary = {}
-        month_name = ''
-        for month in range(1, 13):
-            month_name = date(2000, month, 20).strftime('%b')
-            list_of_mins = []
-            for key in self._records:
-                if key.month == month:
-                    list_of_mins.append(self._records[key].low_temp)
-            if len(list_of_mins) > 0:
-                average = sum(list_of_mins) / len(list_of_mins)
+        for month, month_name in enumerate(MONTH_NAMES, start=1):
+            count = self._low_temp_counts[month]
+            if count > 0:
+                average = self._low_temp_totals[month] / count
                 dictionary[month_name] = average
-            elif len(list_of_mins) == 0:
+            elif count == 0:
                 dictionary[month_name] = None
         return dictionary
 
@@ -304,23 +339,21 @@ Rain: 0
         >>> result[1]
         2
         """
-        one_day = timedelta(days=1)
-        start_date_list = []
-        consecutive_days_list = []
-        for key in self._records:
-            dummy_key = key
-            count = 0
-            while (dummy_key in self._records) and \
-                    (self._records[dummy_key].precipitation > 0
-                     or self._records[dummy_key].precipitation == -1):
-                count += 1
-                dummy_key += one_day
-            start_date_list.append(key)
-            consecutive_days_list.append(count)
-        max_consecutive_days = max(consecutive_days_list)
-        max_start_date = \
-            start_date_list[consecutive_days_list.index(max_consecutive_days)]
-        return max_start_date, max_consecutive_days
+        days = self._precipitation_days
+        max_start_day, max_consecutive_days = None, 0
+        for day in days:
+            # Only count forward from the first day of each sequence
+            if day - 1 not in days:
+                count = 1
+                while day + count in days:
+                    count += 1
+                if count > max_consecutive_days or \
+                        (count == max_consecutive_days
+                         and day < max_start_day):
+                    max_start_day, max_consecutive_days = day, count
+        if max_start_day is None:
+            return min(self._records), 0
+        return date.fromordinal(max_start_day), max_consecutive_days
 
     def percentage_snowfall(self) -> float:
         """Return the fraction of the snowfall and rainfall at this location
@@ -346,14 +379,35 @@ Rain: 0
         >>> toronto_weather.percentage_snowfall()
         0.25
         """
-        total_snowfall = 0
-        total_rainfall = 0
-        for key in self._records:
-            if self._records[key].rainfall != -1:
-                total_rainfall += self._records[key].rainfall
-            if self._records[key].snowfall != -1:
-                total_snowfall += self._records[key].snowfall
-        return total_snowfall / (total_snowfall + total_rainfall)
+        return self._total_snowfall / (self._total_snowfall
+                                       + self._total_rainfall)
+
+    def summary_statistics(self) -> Tuple[float, float, int, float]:
+        """Return the record high for Dec 25, the average minimum temperature
+        in December, the length of the longest sequence of consecutive days
+        with precipitation, and the percentage snowfall at this location.
+
+        The four values are the same as those returned by record_high(12, 25),
+        monthly_average()['Dec'], contiguous_precipitation()[1] and
+        percentage_snowfall(), read from the indexes and running totals kept
+        by add_weather rather than by scanning the recorded weather.
+
+        Preconditions:
+            - The weather on Dec 25 has been recorded in at least one year.
+            - At least one day's weather has been recorded where
+              snowfall > 0 or rainfall > 0 or both.
+
+        >>> weather1 = DailyWeather((0, -4, 5), (1, 0, 1))
+        >>> weather2 = DailyWeather((0, -2, 3), (3, 3, 0))
+        >>> toronto_weather = HistoricalWeather('Toronto', (43.6529, -79.3849))
+        >>> toronto_weather.add_weather(date(2019, 12, 25), weather1)
+        >>> toronto_weather.add_weather(date(2019, 12, 26), weather2)
+        >>> toronto_weather.summary_statistics()
+        (5, -3.0, 2, 0.25)
+        """
+        return (self._record_highs[(12, 25)],
+                self._low_temp_totals[12] / self._low_temp_counts[12],
+                self.contiguous_precipitation()[1], self.percentage_snowfall())
 
 
 class Country:
@@ -381,6 +435,7 @@ class Country:
     - For each key, k, of _histories, k == _histories[k].name
     """
 
+    __slots__ = ('name', '_histories')
     name: str
     _histories: Dict[str, HistoricalWeather]
 
@@ -458,10 +513,7 @@ Rain: 0
         >>> yyz.retrieve_weather(date.today()).avg_temp == 13
         True
         """
-        if name in self._histories:
-            return self._histories[name]
-        else:
-            return None
+        return self._histories.get(name)
 
     def snowiest_location(self) -> Union[Tuple[str, float], Tuple[None, None]]:
         """Return the name of location with the highest percentage snowfall in
@@ -495,17 +547,16 @@ Rain: 0
         if len(self._histories) == 0:
             return None, None
         for location in self._histories:
-            if self._histories[location].percentage_snowfall() >= \
-                    highest_snowfall_percentage:
-                highest_snowfall_percentage = \
-                    self._histories[location].percentage_snowfall()
+            percentage = self._histories[location].percentage_snowfall()
+            if percentage >= highest_snowfall_percentage:
+                highest_snowfall_percentage = percentage
                 highest_snowfall_location = location
         return highest_snowfall_location, highest_snowfall_percentage
 
-    def generate_summary(self) -> None:
+    def generate_summary(self, path: str = 'report.md') -> None:
         """
         Write a summary of interesting statistics for the locations
-        in this Country to a markdown file called report.md
+        in this Country to the markdown file at path (report.md by default).
 
         Precondition:
         - All locations in this Country have at least one row of data
@@ -518,29 +569,18 @@ Rain: 0
                    "contiguous <br/> precipitation",
                    "percentage <br/> snowfall"]
 
-        with open(
-                "../../Library/Mobile Documents/com~apple~CloudDocs/Desktop/My Computer/School Archive/Uni Y2/CSC148/CSC148 Alon Lavie/assignments/a0/a0/a0/report.md", 'w') as f:
-            f.write(" | ".join(headers) + "\n")
-            f.write(":|-".join(["-" * len(col) for col in headers]) + ":\n")
-            for key in self._histories:
-                loc = self._histories[key]
-                (rec_high, mon_avg,
-                 ctgs_prec, perc_snow) = (loc.record_high(12, 25),
-                                          loc.monthly_average(),
-                                          loc.contiguous_precipitation(),
-                                          loc.percentage_snowfall())
-                f.write(f"{key : <20} | {rec_high : <10.4} | "
-                        f"{mon_avg['Dec']} | "
-                        f"{ctgs_prec[1] : <24} | {perc_snow : <18.2}\n")
-
-
-def _delete_specified_rows(main_list: list, list_of_rows: list[int]) -> None:
-    """Deletes rows specified in list_of_rows from main_list"""
-    indices = ()
-    for row_num in list_of_rows:
-        indices += (row_num,)
-    for i in sorted(indices, reverse=True):
-        del main_list[i]
+        # Build the whole report first, so it is written in a single call
+        lines = [" | ".join(headers),
+                 ":|-".join(["-" * len(col) for col in headers]) + ":"]
+        for key in self._histories:
+            (rec_high, dec_avg,
+             ctgs_prec, perc_snow) = self._histories[key].summary_statistics()
+            lines.append(f"{key : <20} | {rec_high : <10.4} | "
+                         f"{dec_avg} | "
+                         f"{ctgs_prec : <24} | {perc_snow : <18.2}")
+
+        with open(path, 'w') as f:
+            f.write("\n".join(lines) + "\n")
 
 
 def load_data(f: TextIO) -> Optional[HistoricalWeather]:
@@ -561,94 +601,93 @@ def load_data(f: TextIO) -> Optional[HistoricalWeather]:
           follow the format specified in the handout.
         - There may be no lines of data, but there is at least a header.
     """
-    # First, sort the file into a list
-    file_as_list = []
-    for line in f:  # Loop through lines
-        if line != '' or line != '\n':  # Make sure line isn't empty
-            line_no_newline = line.strip('\n')
-            row = line_no_newline.split(',')
-            file_as_list.append(row)
-    # Make sure all our data points are of the correct value
-    rows_to_be_deleted = []
-    for row_num in range(len(file_as_list)):
+    # Convert the values of each row as it is read and add them straight to
+    # weather_record, so the file is only walked once and no rows are kept
+    # around. Rows with missing or ill-formed data are skipped.
+    weather_record = None
+    reader = csv.reader(f)
+    next(reader, None)  # Skip the header
+    for row in reader:  # Loop through rows
+        if not row:  # Skip blank lines
+            continue
+        # Make sure all our data points are of the correct value, keeping
+        # the converted values in locals rather than writing them back
+        # into row
         try:
             # Test floats
-            file_as_list[row_num][LONG] = \
-                float(file_as_list[row_num][LONG])
-            file_as_list[row_num][LAT] = \
-                float(file_as_list[row_num][LAT])
-            file_as_list[row_num][MEAN_TEMP] = \
-                float(file_as_list[row_num][MEAN_TEMP])
-            file_as_list[row_num][MAX_TEMP] = \
-                float(file_as_list[row_num][MAX_TEMP])
-            file_as_list[row_num][MIN_TEMP] = \
-                float(file_as_list[row_num][MIN_TEMP])
-
-            # Test ints
-            file_as_list[row_num][YEAR] = \
-                int(file_as_list[row_num][YEAR])
-            file_as_list[row_num][MONTH] = \
-                int(file_as_list[row_num][MONTH])
-            file_as_list[row_num][DAY] = \
-                int(file_as_list[row_num][DAY])
+            coordinates = (float(row[LAT]), float(row[LONG]))
+            temperatures = (float(row[MEAN_TEMP]), float(row[MIN_TEMP]),
+                            float(row[MAX_TEMP]))
+
+            # Test ints, and the date itself
+            day = date(int(row[YEAR]), int(row[MONTH]), int(row[DAY]))
 
             # Test unions
-            if file_as_list[row_num][TOTAL_PRECIP_FLAG] == 'T':
-                file_as_list[row_num][TOTAL_PRECIP] = -1
+            if row[TOTAL_PRECIP_FLAG] == 'T':
+                total_precip = TRACE
             else:
-                file_as_list[row_num][TOTAL_PRECIP] = \
-                    float(file_as_list[row_num][TOTAL_PRECIP])
+                total_precip = float(row[TOTAL_PRECIP])
 
-            if file_as_list[row_num][TOTAL_SNOW_FLAG] == 'T':
-                file_as_list[row_num][TOTAL_SNOW] = -1
+            if row[TOTAL_SNOW_FLAG] == 'T':
+                total_snow = TRACE
             else:
-                file_as_list[row_num][TOTAL_SNOW] = \
-                    float(file_as_list[row_num][TOTAL_SNOW])
+                total_snow = float(row[TOTAL_SNOW])
 
-            if file_as_list[row_num][TOTAL_RAIN_FLAG] == 'T':
-                file_as_list[row_num][TOTAL_RAIN] = -1
+            if row[TOTAL_RAIN_FLAG] == 'T':
+                total_rain = TRACE
             else:
-                file_as_list[row_num][TOTAL_RAIN] = \
-                    float(file_as_list[row_num][TOTAL_RAIN])
+                total_rain = float(row[TOTAL_RAIN])
         except ValueError:
-            rows_to_be_deleted.append(row_num)
-
-    _delete_specified_rows(file_as_list, rows_to_be_deleted)
-
-    if len(file_as_list) == 0:
-        return None
-
-    # Initialize a HistoricalWeather instance
-    weather_record = HistoricalWeather(file_as_list[0][STN_NAME],
-                                       (file_as_list[0][LAT],
-                                        file_as_list[0][LONG]))
-    # Add data from file into weather_record
-    for row in file_as_list:
-        weather_on_day = DailyWeather((row[MEAN_TEMP],
-                                       row[MIN_TEMP], row[MAX_TEMP]),
-                                      (row[TOTAL_PRECIP],
-                                       row[TOTAL_RAIN], row[TOTAL_SNOW]))
-        weather_record.add_weather(date(row[YEAR],
-                                        row[MONTH], row[DAY]),
-                                   weather_on_day)
+            continue
+
+        # Initialize a HistoricalWeather instance from the first good row
+        if weather_record is None:
+            weather_record = HistoricalWeather(row[STN_NAME], coordinates)
+        weather_on_day = DailyWeather(temperatures,
+                                      (total_precip, total_rain, total_snow))
+        weather_record.add_weather(day, weather_on_day)
+
     return weather_record
 
 
+def _load_path(path: str) -> Optional[HistoricalWeather]:
+    """Return the HistoricalWeather record for the csv file at path, as
+    returned by load_data.
+
+    This is a module-level function so that load_country can run it in
+    worker processes.
+    """
+    with open(path, newline='') as location_file:
+        return load_data(location_file)
+
+
 def load_country(folder_name: str, name: str) -> Country:
     """ Return a Country called name that contains all the historical weather
      data stored in the files that are in the folder called folder_name.
 
+    The files are independent of each other, so they are loaded in parallel
+    by a pool of worker processes.
+
     Precondition:
     - Each file in the folder called folder_name:
         - is a .csv files that obeys the format specified in the handout
         - contains data for one location within this Country
     """
     country = Country(name)
-    for filename in os.listdir(folder_name):
-        # If there are any "dot files", ignore them.
-        if not filename.startswith('.'):
-            location_file = open(os.path.join(folder_name, filename), 'r')
-            history = load_data(location_file)
+    # If there are any "dot files" or subfolders, ignore them.
+    with os.scandir(folder_name) as entries:
+        paths = [entry.path for entry in entries
+                 if not entry.name.startswith('.') and entry.is_file()]
+    # Start no more workers than there are files, and no more than the 61
+    # that ProcessPoolExecutor allows on Windows
+    workers = max(1, min(len(paths), os.cpu_count() or 1))
+    if os.name == 'nt':
+        workers = min(workers, 61)
+    # Hand each worker several files per task, if there are enough of them,
+    # so the cost of sending a task is spread over many files
+    chunksize = max(1, len(paths) // (4 * workers))
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        for history in executor.map(_load_path, paths, chunksize=chunksize):
             if history is not None:
                 country.add_history(history)
 
@@ -660,7 +699,8 @@ if __name__ == '__main__':
     # python_ta.check_all(config={
     #     'allowed-io': ['load_country', 'generate_summary'],
     #     'allowed-import-modules': ['doctest', 'python_ta', 'typing',
-    #                                'datetime', 'os'],
+    #                                'datetime', 'os', 'csv',
+    #                                'concurrent.futures'],
     #     'disable': ['E1136'],
     #     'max-attributes': 15,
     # })